@@ -0,0 +1,71 @@
+"""
+Build the offline geocode database used by LocationAnalysisAgent.
+
+Downloads the Geonames cities15000 dump (all cities with a population above
+15,000) and writes a SQLite table keyed by normalized place name. When a name
+is shared by several cities, the most populous one wins.
+
+Usage:
+    python build_geonames_db.py [output_path]
+
+The output path defaults to $GEONAMES_DB, or geonames.db if that is unset,
+which is where main.py looks for it.
+"""
+import csv
+import io
+import os
+import sqlite3
+import sys
+import urllib.request
+import zipfile
+
+GEONAMES_URL = "https://download.geonames.org/export/dump/cities15000.zip"
+GEONAMES_FILE = "cities15000.txt"
+
+# Column indexes in the Geonames "geoname" table dump
+ID, NAME, ASCII_NAME, LAT, LNG, COUNTRY_CODE, POPULATION = 0, 1, 2, 4, 5, 8, 14
+
+
+def download_rows():
+    print(f"Downloading {GEONAMES_URL}...")
+    with urllib.request.urlopen(GEONAMES_URL) as response:
+        archive = zipfile.ZipFile(io.BytesIO(response.read()))
+    with archive.open(GEONAMES_FILE) as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8")
+        yield from csv.reader(text, delimiter="\t", quoting=csv.QUOTE_NONE)
+
+
+def build(path: str) -> None:
+    best = {}
+    for row in download_rows():
+        population = int(row[POPULATION] or 0)
+        entry = (
+            f"{row[NAME]}, {row[COUNTRY_CODE]}",
+            float(row[LAT]),
+            float(row[LNG]),
+            f"geonames:{row[ID]}",
+            population
+        )
+        for name in {row[NAME], row[ASCII_NAME]}:
+            norm_name = name.lower().strip()
+            if norm_name and (norm_name not in best or best[norm_name][4] < population):
+                best[norm_name] = entry
+
+    if os.path.exists(path):
+        os.remove(path)
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE places ("
+        "norm_name TEXT PRIMARY KEY, formatted TEXT, lat REAL, lng REAL, place_id TEXT, population INTEGER)"
+    )
+    db.executemany(
+        "INSERT INTO places VALUES (?, ?, ?, ?, ?, ?)",
+        ((norm_name, *entry) for norm_name, entry in best.items())
+    )
+    db.commit()
+    db.close()
+    print(f"Wrote {len(best)} place names to {path}")
+
+
+if __name__ == "__main__":
+    build(sys.argv[1] if len(sys.argv) > 1 else os.getenv("GEONAMES_DB", "geonames.db"))
@@ -1,91 +1,540 @@
 import os
-import requests
+import re
+import types
+import logging
+import copy
+import sqlite3
+import time
+import asyncio
+import hashlib
+import functools
+import urllib.parse
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import httpx
+import numpy as np
+import redis.asyncio as aioredis
+from diskcache import Cache
 from dotenv import load_dotenv
-from typing import Dict, List, Any, Optional
-from openai import OpenAI
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import json
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple, AsyncIterator
+from openai import AsyncOpenAI, OpenAIError
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator
+import orjson
 from fastapi.middleware.cors import CORSMiddleware
+from query_parser import normalize_query, regex_parse_query, resolvable_location
 
 # Load environment variables
 load_dotenv()
 
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+logger = logging.getLogger(__name__)
+
 # API Keys
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Initialize OpenAI client
-openai_client = OpenAI(
-    api_key=OPENAI_API_KEY
+# Checked once at startup rather than on every request
+if not GOOGLE_MAPS_API_KEY:
+    logger.warning("GOOGLE_MAPS_API_KEY is not set; Google Maps requests will fail")
+if not OPENAI_API_KEY:
+    logger.warning("OPENAI_API_KEY is not set; OpenAI requests will fail")
+
+# Chat model used for query analysis
+QUERY_ANALYSIS_MODEL = os.getenv("QUERY_ANALYSIS_MODEL", "gpt-4o-mini")
+
+# Optional Redis URL for sharing the LLM response cache across processes
+REDIS_URL = os.getenv("REDIS_URL")
+
+# On-disk geocode cache location
+GEOCODE_CACHE_DIR = os.getenv("GEOCODE_CACHE_DIR", ".cache/geocode")
+
+# Offline city geocode database, built with build_geonames_db.py
+GEONAMES_DB = os.getenv("GEONAMES_DB", "geonames.db")
+
+# Comma-separated browser origins allowed to call the API
+CORS_ORIGINS = [
+    origin.strip() for origin in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",") if origin.strip()
+]
+
+# Initialize OpenAI client on its own pooled HTTP/2 connection so concurrent
+# analysis and embedding calls multiplex over a warm connection
+openai_client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    http_client=httpx.AsyncClient(http2=True, limits=httpx.Limits(max_connections=50))
+)
+
+# Shared async HTTP client so Google Maps calls reuse keep-alive (HTTP/2)
+# connections and never block the event loop. Pool limits are sized for
+# Google's default 100 QPS quota; they must be set on the transport, since an
+# explicit transport makes httpx ignore the client-level limits.
+GOOGLE_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=100, max_connections=200, keepalive_expiry=120)
+HTTP_CLIENT = httpx.AsyncClient(
+    headers={"User-Agent": "concierge-ai/1.0"},
+    timeout=httpx.Timeout(5.0, connect=2.0),
+    transport=httpx.AsyncHTTPTransport(http2=True, retries=2, limits=GOOGLE_HTTP_LIMITS)
 )
 
+# Bounds the per-place details fan-out so a burst of queries can't flood Google.
+# Created on first use: on Python 3.8 an asyncio.Semaphore binds to the loop
+# current at construction, which at import time isn't the server's loop.
+GOOGLE_CONCURRENCY_LIMIT = 20
+_google_concurrency: Optional[asyncio.Semaphore] = None
+
+def google_concurrency() -> asyncio.Semaphore:
+    global _google_concurrency
+    if _google_concurrency is None:
+        _google_concurrency = asyncio.Semaphore(GOOGLE_CONCURRENCY_LIMIT)
+    return _google_concurrency
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call in the default executor (asyncio.to_thread needs Python 3.9)"""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+# Transient failures and rate limiting are retried with exponential backoff
+# (0.1s, 0.2s, ...), honouring Retry-After when Google sends one
+GOOGLE_MAX_ATTEMPTS = 5
+GOOGLE_RETRY_BACKOFF = 0.1
+GOOGLE_MAX_BACKOFF = 10.0
+GOOGLE_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Delay requested by a Retry-After header in seconds form, if any"""
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+async def google_get(url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    GET a Google Maps endpoint through the shared client and return the decoded
+    JSON. Hot paths may pass a prebuilt query string in url and no params.
+    """
+    for attempt in range(GOOGLE_MAX_ATTEMPTS):
+        last_attempt = attempt == GOOGLE_MAX_ATTEMPTS - 1
+        delay = GOOGLE_RETRY_BACKOFF * 2 ** attempt
+        try:
+            async with google_concurrency():
+                response = await HTTP_CLIENT.get(url, params=params)
+        except httpx.TransportError:
+            if last_attempt:
+                raise
+        else:
+            if response.status_code in GOOGLE_RETRY_STATUSES and not last_attempt:
+                delay = _retry_after_seconds(response) or delay
+            else:
+                response.raise_for_status()
+                data = orjson.loads(response.content)
+                # Google also reports quota exhaustion in the body of a 200 response
+                if data.get("status") != "OVER_QUERY_LIMIT" or last_attempt:
+                    return data
+        # Sleep outside the semaphore so waiting retries don't hold a slot
+        await asyncio.sleep(min(delay, GOOGLE_MAX_BACKOFF))
+
+class MemoryLRU:
+    """In-process LRU cache backend with per-entry TTL"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+class RedisBackend:
+    """Redis cache backend, shares cached string values across worker processes"""
+
+    def __init__(self, url: str, prefix: str = "concierge:llm:"):
+        self.client = aioredis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await self.client.setex(self.prefix + key, ttl, value)
+
+# Each worker already keeps analyses in its in-process query caches, which are
+# checked first, so this cache only exists to share replies across workers and
+# is disabled without Redis. Its TTL matches QUERY_ANALYSIS_CACHE_TTL.
+LLM_CACHE: Optional[RedisBackend] = RedisBackend(REDIS_URL) if REDIS_URL else None
+LLM_CACHE_TTL = 86400  # seconds
+
+def llm_cache_key(model: str, messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]] = None) -> str:
+    """Deterministic cache key for a chat completion request"""
+    payload = orjson.dumps(
+        {"model": model, "messages": messages, "response_format": response_format},
+        option=orjson.OPT_SORT_KEYS
+    )
+    return hashlib.sha256(payload).hexdigest()
+
+async def cached_chat(client: AsyncOpenAI, validate: Callable[[str], Any] = str, **kwargs) -> Any:
+    """
+    Run a chat completion through LLM_CACHE (when Redis is configured) and
+    return validate(content). Identical requests are served from the cache
+    without an OpenAI round-trip. Content is only cached once validate accepts
+    it, so a truncated or malformed reply is not replayed; an empty reply
+    raises ValueError.
+    """
+    key = llm_cache_key(kwargs["model"], kwargs["messages"], kwargs.get("response_format"))
+    if LLM_CACHE is not None:
+        hit = await LLM_CACHE.get(key)
+        if hit is not None:
+            return validate(hit)
+
+    response = await client.chat.completions.create(**kwargs)
+    content = response.choices[0].message.content
+    if content is None:
+        # e.g. a structured-output refusal
+        raise ValueError("Chat completion returned no content")
+    result = validate(content)
+    if LLM_CACHE is not None:
+        await LLM_CACHE.set(key, content, ttl=LLM_CACHE_TTL)
+    return result
+
+class SemanticCache:
+    """
+    Embedding-based cache that returns a prior result for paraphrased queries
+    whose cosine similarity to a cached query is above the threshold.
+    Entries expire after ttl seconds; once maxsize is reached, an expired or
+    else the least recently used entry is replaced.
+    """
+
+    def __init__(self, openai_client: AsyncOpenAI, threshold: float = 0.95, maxsize: int = 1000,
+                 ttl: int = 86400, model: str = "text-embedding-3-small"):
+        self.openai_client = openai_client
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+        # Rows are allocated on the first add, once the embedding size is known
+        self._vectors: Optional[np.ndarray] = None
+        self._values: List[Any] = []
+        self._last_used = np.zeros(maxsize, dtype=np.int64)
+        self._expires_at = np.zeros(maxsize, dtype=np.float64)
+        self._clock = 0
+
+    async def embed(self, text: str) -> np.ndarray:
+        response = await self.openai_client.embeddings.create(model=self.model, input=text)
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def lookup(self, vector: np.ndarray) -> Optional[Any]:
+        if self._values:
+            # Vectors are L2-normalized, so the dot product is the cosine similarity
+            count = len(self._values)
+            scores = self._vectors[:count] @ vector
+            scores[self._expires_at[:count] < time.monotonic()] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                self._touch(best)
+                self.hits += 1
+                return self._values[best]
+        self.misses += 1
+        return None
+
+    def add(self, vector: np.ndarray, value: Any) -> None:
+        if self._vectors is None:
+            self._vectors = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+        if len(self._values) < self.maxsize:
+            slot = len(self._values)
+            self._values.append(value)
+        else:
+            expired = self._expires_at < time.monotonic()
+            slot = int(np.argmin(np.where(expired, -1, self._last_used)))
+            self._values[slot] = value
+        self._vectors[slot] = vector
+        self._expires_at[slot] = time.monotonic() + self.ttl
+        self._touch(slot)
+
+    def _touch(self, slot: int) -> None:
+        self._clock += 1
+        self._last_used[slot] = self._clock
+
+# Shared across requests so hits survive per-request agent construction.
+# L1 is keyed on the normalized query text, L2 on its embedding.
+QUERY_ANALYSIS_CACHE_TTL = 86400
+QUERY_ANALYSIS_EXACT_CACHE = MemoryLRU(maxsize=1000)
+QUERY_ANALYSIS_CACHE = SemanticCache(openai_client, maxsize=1000, ttl=QUERY_ANALYSIS_CACHE_TTL)
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto a single in-flight call"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, coro_factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled caller doesn't cancel the work shared with the others
+        return await asyncio.shield(task)
+
+ANALYSIS_FLIGHTS = SingleFlight()
+GEOCODE_FLIGHTS = SingleFlight()
+
+class Temporal(BaseModel):
+    """Time-related requirements extracted from a query"""
+    model_config = ConfigDict(extra="forbid")
+
+    day: Optional[str]
+    time: Optional[str]
+    time_context: Optional[str]
+
+class QueryAnalysis(BaseModel):
+    """Structured output schema enforced on the query-analysis LLM call"""
+    model_config = ConfigDict(extra="forbid")
+
+    intent: str
+    place_type: str
+    attributes: List[str]
+    location: str
+    temporal: Temporal
+    preferences: List[str]
+
+# Strict JSON schema so the model output always validates against QueryAnalysis
+QUERY_ANALYSIS_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "query_analysis",
+        "strict": True,
+        "schema": QueryAnalysis.model_json_schema()
+    }
+}
+
+# Static system prompt for QueryAnalysisAgent. It must stay byte-identical across
+# calls and carry no per-query content so OpenAI's prompt-prefix cache applies;
+# the user query is sent as the final message.
+QUERY_ANALYSIS_PROMPT = """You are a specialized agent for understanding location-based queries.
+Analyze the user's query and extract structured information.
+
+Consider:
+1. Intent (finding places, checking hours, getting directions, etc.)
+2. Place type and attributes
+3. Location details
+4. Temporal requirements (if any)
+5. Special requirements or preferences
+
+Provide a detailed JSON response with these fields:
+- intent: primary purpose of the query
+- place_type: main type of establishment (e.g., restaurant, cafe)
+- attributes: list of specific attributes or requirements (e.g., ["biryani", "muslim-style"])
+- location: specific location or area
+- temporal: any time-related requirements (can be empty if none specified)
+  - day: day of week (if specified)
+  - time: specific time (if specified)
+  - time_context: "open_until", "open_from", or "open_at" (if specified)
+- preferences: additional preferences or requirements
+
+For queries without time requirements, set every temporal field to null.
+"""
+
+def _time_token(value: Optional[str]) -> str:
+    """Loose canonical form of a time string, so "9 p.m." and "9:00pm" compare equal"""
+    return re.sub(r"[\s.]|:00\b", "", (value or "").lower())
+
+def _location_components(location: str) -> List[str]:
+    return [normalize_query(part) for part in location.split(",") if part.strip()]
+
+def _location_prefix_matches(parsed: str, cached: str) -> bool:
+    """
+    Whether the parsed location names the same place as the leading components
+    of the cached one: "berlin" matches "Berlin, Germany", "york" does not
+    match "New York, NY, USA"
+    """
+    parsed_parts = _location_components(parsed)
+    return parsed_parts == _location_components(cached)[:len(parsed_parts)]
+
+def slots_agree(parsed: Dict[str, Any], cached: Dict[str, Any]) -> bool:
+    """
+    Whether a cached analysis is consistent with the slots the rule-based
+    parser found in the new query. Near-duplicate embeddings can differ only
+    in the city, day or time, which must not be carried over.
+    """
+    if parsed["location"] and not _location_prefix_matches(parsed["location"], cached["location"]):
+        return False
+    cached_temporal = cached.get("temporal") or {}
+    if parsed["temporal"]["day"] and parsed["temporal"]["day"] not in (cached_temporal.get("day") or "").lower():
+        return False
+    if parsed["temporal"]["time"] and _time_token(parsed["temporal"]["time"]) != _time_token(cached_temporal.get("time")):
+        return False
+    return True
+
 class QueryAnalysisAgent:
     """Agent responsible for understanding and structuring natural language queries"""
     
-    def __init__(self, openai_client: OpenAI):
+    __slots__ = ("openai_client", "semantic_cache")
+
+    MODEL = QUERY_ANALYSIS_MODEL
+
+    def __init__(self, openai_client: AsyncOpenAI):
         self.openai_client = openai_client
+        self.semantic_cache = QUERY_ANALYSIS_CACHE
 
-    def analyze(self, query: str) -> Dict[str, Any]:
-        prompt = """You are a specialized agent for understanding location-based queries.
-        Analyze the following query and extract structured information.
-        
-        Consider:
-        1. Intent (finding places, checking hours, getting directions, etc.)
-        2. Place type and attributes
-        3. Location details
-        4. Temporal requirements (if any)
-        5. Special requirements or preferences
-        
-        Query: {query}
-        
-        Provide a detailed JSON response with these fields:
-        - intent: primary purpose of the query
-        - place_type: main type of establishment (e.g., restaurant, cafe)
-        - attributes: list of specific attributes or requirements (e.g., ["biryani", "muslim-style"])
-        - location: specific location or area
-        - temporal: any time-related requirements (can be empty if none specified)
-          - day: day of week (if specified)
-          - time: specific time (if specified)
-          - time_context: "open_until", "open_from", or "open_at" (if specified)
-        - preferences: additional preferences or requirements
-        
-        For queries without time requirements, return an empty object for temporal.
-        """
-        
-        response = self.openai_client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": query}
-            ],
-            response_format={ "type": "json_object" }
-        )
-        
-        return json.loads(response.choices[0].message.content)
+    async def analyze(self, query: str) -> Dict[str, Any]:
+        query = normalize_query(query)
+        analysis = await ANALYSIS_FLIGHTS.do(query, lambda: self._analyze(query))
+        # Cached analyses are shared, so callers get their own copy to mutate
+        return copy.deepcopy(analysis)
+
+    async def _analyze(self, query: str) -> Dict[str, Any]:
+        # Repeats of an already analyzed query skip the embedding and the chat completion
+        cached = await QUERY_ANALYSIS_EXACT_CACHE.get(query)
+        if cached is not None:
+            return cached
+
+        # Simple queries the precompiled patterns fully cover need no LLM call
+        parsed, complete = regex_parse_query(query)
+        if complete:
+            return parsed
+
+        # Paraphrases of an already analyzed query skip the chat completion. The
+        # semantic cache is only an optimization, so an embeddings failure is a miss.
+        vector = None
+        try:
+            vector = await self.semantic_cache.embed(query)
+        except OpenAIError as e:
+            logger.warning("Query embedding failed (%s), skipping the semantic cache", e)
+        else:
+            cached = self.semantic_cache.lookup(vector)
+            if cached is not None and not slots_agree(parsed, cached):
+                logger.debug("Semantic cache hit disagrees with the parsed slots, ignoring it")
+                cached = None
+            if cached is not None:
+                await QUERY_ANALYSIS_EXACT_CACHE.set(query, cached, ttl=QUERY_ANALYSIS_CACHE_TTL)
+                return cached
+
+        try:
+            analysis = await cached_chat(
+                self.openai_client,
+                validate=QueryAnalysis.model_validate_json,
+                model=self.MODEL,
+                messages=[
+                    {"role": "system", "content": QUERY_ANALYSIS_PROMPT},
+                    {"role": "user", "content": query}
+                ],
+                response_format=QUERY_ANALYSIS_FORMAT,
+                # Deterministic output keeps the response caches consistent
+                temperature=0,
+                # Routes every analysis call to the same prompt-prefix cache shard
+                extra_body={"prompt_cache_key": "query-analysis"}
+            )
+            analysis = analysis.model_dump()
+        except (OpenAIError, ValueError) as e:
+            # Fall back to the rule-based parser (pydantic's ValidationError is a
+            # ValueError); not cached so the LLM is retried next time
+            if not (parsed["place_type"] and resolvable_location(parsed["location"])):
+                raise
+            logger.warning("Query analysis failed (%s), using rule-based fallback", e)
+            return parsed
+
+        if vector is not None:
+            self.semantic_cache.add(vector, analysis)
+        await QUERY_ANALYSIS_EXACT_CACHE.set(query, analysis, ttl=QUERY_ANALYSIS_CACHE_TTL)
+        return analysis
+
+# Geocode results are stable; Google permits caching them for up to 30 days.
+# A small in-process LRU sits in front of the disk cache to skip deserialization
+# on hot keys.
+GEOCODE_CACHE_TTL = 60 * 60 * 24 * 30
+GEOCODE_MEMORY_CACHE = MemoryLRU(maxsize=4096)
+GEOCODE_DISK_CACHE = Cache(GEOCODE_CACHE_DIR, size_limit=1 << 30)
+
+# Popular city names resolve locally without a Google Geocoding call
+_GEO_DB = sqlite3.connect(GEONAMES_DB, check_same_thread=False) if os.path.exists(GEONAMES_DB) else None
+
+def lookup_offline_location(memo_key: str) -> Optional[Dict[str, Any]]:
+    """Resolve a normalized location name against the offline Geonames database"""
+    if _GEO_DB is None:
+        return None
+    row = _GEO_DB.execute(
+        "SELECT formatted, lat, lng, place_id FROM places WHERE norm_name = ?", (memo_key,)
+    ).fetchone()
+    if row is None:
+        return None
+    return {
+        "valid": True,
+        "formatted_address": row[0],
+        "coordinates": {"lat": row[1], "lng": row[2]},
+        "place_id": row[3],
+        "types": ["locality"],
+        "bounds": None
+    }
 
 class LocationAnalysisAgent:
     """Agent responsible for analyzing and validating location information"""
     
+    __slots__ = ("google_api_key",)
+
+    BASE_URL = "https://maps.googleapis.com/maps/api"
+    GEOCODE_URL = f"{BASE_URL}/geocode/json"
+
     def __init__(self, google_api_key: str):
         self.google_api_key = google_api_key
-        self.base_url = "https://maps.googleapis.com/maps/api"
 
-    def validate_and_enhance_location(self, location: str) -> Dict[str, Any]:
-        geocode_url = f"{self.base_url}/geocode/json"
-        params = {
+    async def validate_and_enhance_location(self, location: str) -> Dict[str, Any]:
+        memo_key = normalize_query(location)
+        return await GEOCODE_FLIGHTS.do(memo_key, lambda: self._geocode(location, memo_key))
+
+    async def lookup_cached(self, location: str) -> Optional[Dict[str, Any]]:
+        """Resolve a location from the memory, disk and offline caches only, never calling Google"""
+        return await self._lookup_local(normalize_query(location))
+
+    async def _lookup_local(self, memo_key: str) -> Optional[Dict[str, Any]]:
+        cached = await GEOCODE_MEMORY_CACHE.get(memo_key)
+        if cached is None:
+            cached = await run_blocking(GEOCODE_DISK_CACHE.get, memo_key)
+            if cached is not None:
+                await GEOCODE_MEMORY_CACHE.set(memo_key, cached, ttl=GEOCODE_CACHE_TTL)
+        if cached is not None:
+            return cached
+
+        offline = await run_blocking(lookup_offline_location, memo_key)
+        if offline is not None:
+            await GEOCODE_MEMORY_CACHE.set(memo_key, offline, ttl=GEOCODE_CACHE_TTL)
+        return offline
+
+    async def _geocode(self, location: str, memo_key: str) -> Dict[str, Any]:
+        cached = await self._lookup_local(memo_key)
+        if cached is not None:
+            return cached
+
+        query = {
             "address": location,
             "key": self.google_api_key
         }
         
-        response = requests.get(geocode_url, params=params)
-        data = response.json()
+        data = await google_get(self.GEOCODE_URL, query)
         
         if data.get("status") != "OK":
             return {"valid": False, "error": "Location not found"}
             
         result = data["results"][0]
-        return {
+        location_info = {
             "valid": True,
             "formatted_address": result["formatted_address"],
             "coordinates": result["geometry"]["location"],
@@ -93,194 +542,317 @@ class LocationAnalysisAgent:
             "types": result.get("types", []),
             "bounds": result.get("geometry", {}).get("bounds")
         }
+        await GEOCODE_MEMORY_CACHE.set(memo_key, location_info, ttl=GEOCODE_CACHE_TTL)
+        await run_blocking(GEOCODE_DISK_CACHE.set, memo_key, location_info, expire=GEOCODE_CACHE_TTL)
+        return location_info
+
+# Day-of-week numbering used by Google Places opening_hours periods
+_DAY_MAPPING = types.MappingProxyType({
+    "monday": 1, "tuesday": 2, "wednesday": 3, "thursday": 4,
+    "friday": 5, "saturday": 6, "sunday": 0
+})
+
+# Matches "9", "21", "11:30", "11:30pm", "9 a.m.", "10 PM"
+_TIME_RE = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*([ap]\.?m\.?)?\s*$", re.I)
 
 class TimeAnalysisAgent:
     """Agent responsible for parsing and validating temporal requirements"""
     
+    __slots__ = ()
+
     def parse_time_requirement(self, temporal_info: Dict[str, Any]) -> Dict[str, Any]:
-        day_mapping = {
-            "monday": 1, "tuesday": 2, "wednesday": 3, "thursday": 4,
-            "friday": 5, "saturday": 6, "sunday": 0
-        }
-        
         try:
-            day = temporal_info.get("day", "").lower()
-            time_str = temporal_info.get("time", "")
-            context = temporal_info.get("time_context", "open_until")
+            day = (temporal_info.get("day") or "").lower()
+            time_str = temporal_info.get("time") or ""
+            context = temporal_info.get("time_context") or "open_until"
             
             # Convert time to 24-hour format
-            if isinstance(time_str, str) and ("am" in time_str.lower() or "pm" in time_str.lower()):
-                time_parts = time_str.lower().replace(".", "").strip().split()
-                hour = int(time_parts[0])
-                if "pm" in time_parts[1] and hour != 12:
-                    hour += 12
-                elif "am" in time_parts[1] and hour == 12:
-                    hour = 0
-            else:
-                hour = int(time_str) if time_str else None
+            hour = minute = None
+            match = _TIME_RE.match(str(time_str))
+            if match:
+                hour = int(match.group(1))
+                minute = int(match.group(2) or 0)
+                suffix = match.group(3)
+                # "13 pm" or "25:00" would otherwise yield an impossible hhmm
+                if minute > 59 or hour > (12 if suffix else 23):
+                    raise ValueError(f"Time out of range: {time_str!r}")
+                if suffix:
+                    # 12am -> 0, 12pm -> 12, 1pm -> 13
+                    hour = hour % 12 + (12 if suffix[0] in "pP" else 0)
+            elif time_str:
+                raise ValueError(f"Unrecognized time: {time_str!r}")
 
             return {
-                "day_number": day_mapping.get(day, -1),
+                "day_number": _DAY_MAPPING.get(day, -1),
                 "day_name": day,
                 "hour_24": hour,
+                "minute": minute,
+                # Same HHMM form as Google's opening_hours period times
+                "hhmm": hour * 100 + minute if hour is not None else None,
                 "context": context,
-                "valid": bool(day in day_mapping and hour is not None)
+                "valid": bool(day in _DAY_MAPPING and hour is not None)
             }
         except Exception as e:
             return {"valid": False, "error": str(e)}
 
+class PlaceResult(BaseModel):
+    """A search result as returned to clients, validated from a Google place details result"""
+    model_config = ConfigDict(extra="ignore")
+
+    name: str = "Unnamed place"
+    address: str = Field("No address available", validation_alias="formatted_address")
+    rating: Optional[float] = None
+    website: Optional[str] = None
+    phone: Optional[str] = Field(None, validation_alias="formatted_phone_number")
+    opening_hours: Optional[List[str]] = None
+    user_ratings_total: Optional[int] = None
+
+    @field_validator("opening_hours", mode="before")
+    @classmethod
+    def _weekday_text(cls, value: Any) -> Optional[List[str]]:
+        return value.get("weekday_text", []) if value else None
+
+# Validates and dumps a whole result list in one pydantic-core pass
+_PLACE_RESULTS_ADAPTER = TypeAdapter(List[PlaceResult])
+
+# Place details include opening_hours, which can change, so they expire after an hour
+PLACE_DETAILS_CACHE_TTL = 3600
+PLACE_DETAILS_CACHE = MemoryLRU(maxsize=10_000)
+PLACE_DETAILS_FIELDS = "name,place_id,formatted_address,opening_hours,website,formatted_phone_number,rating,user_ratings_total"
+
+# Nearby searches for the same spot, type and keywords barely change within a
+# few minutes. Coordinates are snapped to a ~500m grid (0.005 degrees) so
+# slightly different geocodes of the same area share an entry.
+NEARBY_SEARCH_CACHE_TTL = 900
+NEARBY_SEARCH_CACHE = MemoryLRU(maxsize=5000)
+NEARBY_SEARCH_GRID = 200
+
+def nearby_search_key(lat: float, lng: float, place_type: str, attributes: List[str]) -> str:
+    return (
+        f"{round(lat * NEARBY_SEARCH_GRID)}:{round(lng * NEARBY_SEARCH_GRID)}:"
+        f"{place_type}:{','.join(sorted(attributes))}"
+    )
+
 class GoogleMapsLLMIntegration:
     """
     Enhanced integration class using specialized agents for better query understanding
     """
     
-    def __init__(self, google_api_key: str, openai_client: OpenAI):
+    __slots__ = ("query_agent", "location_agent", "time_agent", "google_api_key", "_details_query_tail")
+
+    BASE_URL = "https://maps.googleapis.com/maps/api"
+    NEARBY_SEARCH_URL = f"{BASE_URL}/place/nearbysearch/json"
+    DETAILS_URL = f"{BASE_URL}/place/details/json"
+
+    def __init__(self, google_api_key: str, openai_client: AsyncOpenAI):
         self.query_agent = QueryAnalysisAgent(openai_client)
         self.location_agent = LocationAnalysisAgent(google_api_key)
         self.time_agent = TimeAnalysisAgent()
         self.google_api_key = google_api_key
-        self.base_url = "https://maps.googleapis.com/maps/api"
+        # The fields and key never change, so they are encoded once and only
+        # the place id is added per details request
+        self._details_query_tail = (
+            f"fields={urllib.parse.quote_plus(PLACE_DETAILS_FIELDS)}&key={urllib.parse.quote_plus(google_api_key or '')}"
+        )
 
-    def process_query(self, user_query: str) -> List[Dict[str, Any]]:
+    async def process_query(self, user_query: str) -> List[Dict[str, Any]]:
         """
         Enhanced query processing using multiple agents
         """
         try:
-            # Step 1: Analyze the query using the QueryAnalysisAgent
-            print("Step 1: Analyzing query...")
-            query_analysis = self.query_agent.analyze(user_query)
-            print(f"Query analysis: {query_analysis}")
-
-            # Step 2: Validate and enhance location information
-            print("Step 2: Validating location...")
-            location_info = self.location_agent.validate_and_enhance_location(query_analysis["location"])
-            if not location_info["valid"]:
-                raise ValueError(f"Invalid location: {location_info.get('error')}")
-            print(f"Location info: {location_info}")
-
-            # Step 3: Parse temporal requirements (only if present)
-            has_time_requirements = query_analysis.get("temporal") and any(query_analysis["temporal"].values())
-            time_info = None
-            if has_time_requirements:
-                print("Step 3: Analyzing temporal requirements...")
-                time_info = self.time_agent.parse_time_requirement(query_analysis["temporal"])
-                if not time_info["valid"]:
-                    raise ValueError(f"Invalid time requirement: {time_info.get('error')}")
-                print(f"Time info: {time_info}")
-            else:
-                print("No temporal requirements specified, skipping time validation...")
-
-            # Step 4: Search for places using enhanced information
-            search_params = {
-                "location": f"{location_info['coordinates']['lat']},{location_info['coordinates']['lng']}",
-                "radius": 1500,
-                "type": query_analysis["place_type"].lower(),
-                "keyword": " ".join(query_analysis["attributes"]),
-                "key": self.google_api_key
-            }
-            
-            places_url = f"{self.base_url}/place/nearbysearch/json"
-            places_response = requests.get(places_url, params=search_params)
-            places_data = places_response.json()
-
-            if places_data.get("status") != "OK":
-                return []
-
-            # Step 5: Filter and enhance results
-            results = []
-            for place in places_data.get("results", []):
-                # Only validate timing if temporal requirements exist
-                if has_time_requirements:
-                    if self._validate_place_timing(place["place_id"], time_info):
-                        details = self._get_place_details(place["place_id"])
-                        if details:
-                            results.append(details)
-                else:
-                    details = self._get_place_details(place["place_id"])
-                    if details:
-                        results.append(details)
+            place_ids, time_info = await self._find_candidates(user_query)
+
+            # Step 5: Filter and enhance results, fetching all candidates concurrently
+            details_list = await asyncio.gather(*[self._get_place_details(place_id) for place_id in place_ids])
+
+            # Only validate timing if temporal requirements exist; the details
+            # already carry opening_hours, so all places are checked in one pass
+            results = [details for details in details_list if details]
+            if time_info is not None:
+                results = [results[i] for i in np.flatnonzero(self._timing_mask(results, time_info))]
 
             return self.format_results(results)
 
         except Exception as e:
-            print(f"Error in process_query: {str(e)}")
+            logger.error("Error in process_query: %s", e)
             return []
 
-    def _validate_place_timing(self, place_id: str, time_info: Dict[str, Any]) -> bool:
-        """Validate if a place meets the temporal requirements"""
-        details_url = f"{self.base_url}/place/details/json"
-        details_params = {
-            "place_id": place_id,
-            "fields": "opening_hours",
+    async def process_query_stream(self, user_query: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Like process_query, but yields each formatted place as soon as its
+        details arrive instead of waiting for the whole batch
+        """
+        try:
+            place_ids, time_info = await self._find_candidates(user_query)
+            for next_details in asyncio.as_completed([self._get_place_details(place_id) for place_id in place_ids]):
+                details = await next_details
+                if details and (time_info is None or self._timing_mask([details], time_info)[0]):
+                    yield PlaceResult.model_validate(details).model_dump()
+        except Exception as e:
+            logger.error("Error in process_query_stream: %s", e)
+
+    async def _find_candidates(self, user_query: str) -> Tuple[List[str], Optional[Dict[str, Any]]]:
+        """
+        Run analysis, geocoding and nearbysearch for a query. Returns the
+        candidate place ids and the parsed time requirement (None if the
+        query has none).
+        """
+        # Complete rule-based parses skip the LLM; for the rest, look up the
+        # location the parser found while the LLM analysis runs. Only the local
+        # caches are consulted, so a wrong guess costs no Google request.
+        parsed, complete = regex_parse_query(normalize_query(user_query))
+        guess = parsed["location"] if not complete and resolvable_location(parsed["location"]) else ""
+        speculative_task = self._background(self.location_agent.lookup_cached(guess)) if guess else None
+
+        # Step 1: Analyze the query using the QueryAnalysisAgent
+        logger.debug("Step 1: Analyzing query...")
+        try:
+            query_analysis = await self.query_agent.analyze(user_query)
+        except Exception:
+            if speculative_task:
+                speculative_task.cancel()
+            raise
+        logger.debug("Query analysis: %s", query_analysis)
+
+        # Step 2: Validate and enhance location information. The geocode only
+        # depends on the analysis, so it runs while the temporal requirements
+        # are parsed below.
+        logger.debug("Step 2: Validating location...")
+        if speculative_task and normalize_query(query_analysis["location"]) != guess:
+            speculative_task.cancel()
+            speculative_task = None
+        location_task = self._background(self._resolve_location(query_analysis["location"], speculative_task))
+
+        # Step 3: Parse temporal requirements (only if present)
+        has_time_requirements = query_analysis.get("temporal") and any(query_analysis["temporal"].values())
+        time_info = None
+        if has_time_requirements:
+            logger.debug("Step 3: Analyzing temporal requirements...")
+            time_info = self.time_agent.parse_time_requirement(query_analysis["temporal"])
+            if not time_info["valid"]:
+                location_task.cancel()
+                raise ValueError(f"Invalid time requirement: {time_info.get('error')}")
+            logger.debug("Time info: %s", time_info)
+        else:
+            logger.debug("No temporal requirements specified, skipping time validation...")
+
+        location_info = await location_task
+        if not location_info["valid"]:
+            raise ValueError(f"Invalid location: {location_info.get('error')}")
+        logger.debug("Location info: %s", location_info)
+
+        # Step 4: Search for places using enhanced information
+        lat, lng = location_info["coordinates"]["lat"], location_info["coordinates"]["lng"]
+        place_type = query_analysis["place_type"].lower()
+        cache_key = nearby_search_key(lat, lng, place_type, query_analysis["attributes"])
+        place_ids = await NEARBY_SEARCH_CACHE.get(cache_key)
+        if place_ids is not None:
+            logger.debug("Nearby search cache hit for %s", cache_key)
+            return list(place_ids), time_info
+
+        search_params = {
+            "location": f"{lat},{lng}",
+            "radius": 1500,
+            "type": place_type,
+            "keyword": " ".join(query_analysis["attributes"]),
             "key": self.google_api_key
         }
         
-        response = requests.get(details_url, params=details_params)
-        data = response.json()
-        
-        if data.get("status") != "OK":
-            return False
-            
-        opening_hours = data.get("result", {}).get("opening_hours", {})
-        if not opening_hours:
-            return False
-            
-        periods = opening_hours.get("periods", [])
-        for period in periods:
-            if period.get("open", {}).get("day") == time_info["day_number"]:
-                close_time = period.get("close", {}).get("time")
-                if close_time and int(close_time) >= time_info["hour_24"] * 100:
-                    return True
-        
-        return False
+        places_data = await google_get(self.NEARBY_SEARCH_URL, search_params)
+
+        status = places_data.get("status")
+        if status not in ("OK", "ZERO_RESULTS"):
+            return [], time_info
+
+        # Drop candidates the nearbysearch payload already rules out before paying for details
+        place_ids = [
+            place["place_id"] for place in places_data.get("results", [])
+            if place.get("business_status", "OPERATIONAL") == "OPERATIONAL"
+        ]
+        await NEARBY_SEARCH_CACHE.set(cache_key, tuple(place_ids), ttl=NEARBY_SEARCH_CACHE_TTL)
+        return place_ids, time_info
+
+    async def _resolve_location(self, location: str, speculative_task: Optional[asyncio.Task]) -> Dict[str, Any]:
+        """Geocode a location, reusing the speculative cache lookup for it if that found it"""
+        if speculative_task is not None:
+            cached = await speculative_task
+            if cached is not None:
+                return cached
+        return await self.location_agent.validate_and_enhance_location(location)
+
+    @staticmethod
+    def _background(coro: Awaitable[Any]) -> asyncio.Task:
+        """
+        Run a coroutine as a task. The task may be cancelled or dropped after
+        it already failed, so its exception is always retrieved to keep
+        asyncio from logging "Task exception was never retrieved".
+        """
+        task = asyncio.create_task(coro)
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return task
+
+    @staticmethod
+    def _periods_to_soa(details_list: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Pack the opening periods of N places into an int16 [N, 7] array of the
+        latest closing time (HHMM) per opening day; -1 marks a day without a period
+        """
+        closes = np.full((len(details_list), 7), -1, dtype=np.int16)
+        for row, details in enumerate(details_list):
+            for period in (details.get("opening_hours") or {}).get("periods", []):
+                if "open" in period and "close" in period:
+                    day = period["open"]["day"]
+                    closes[row, day] = max(closes[row, day], int(period["close"]["time"]))
+        return closes
 
-    def _get_place_details(self, place_id: str) -> Optional[Dict[str, Any]]:
+    @classmethod
+    def _timing_mask(cls, details_list: List[Dict[str, Any]], time_info: Dict[str, Any]) -> np.ndarray:
+        """Boolean mask of the places whose hours meet the temporal requirements"""
+        return cls._periods_to_soa(details_list)[:, time_info["day_number"]] >= time_info["hhmm"]
+
+    async def _get_place_details(self, place_id: str) -> Optional[Dict[str, Any]]:
         """Get detailed information about a place"""
-        details_url = f"{self.base_url}/place/details/json"
-        details_params = {
-            "place_id": place_id,
-            "fields": "name,place_id,formatted_address,opening_hours,website,formatted_phone_number,rating,user_ratings_total",
-            "key": self.google_api_key
-        }
-        
-        response = requests.get(details_url, params=details_params)
-        data = response.json()
+        cached = await PLACE_DETAILS_CACHE.get(place_id)
+        if cached is not None:
+            return cached
+
+        data = await google_get(
+            f"{self.DETAILS_URL}?place_id={urllib.parse.quote_plus(place_id)}&{self._details_query_tail}"
+        )
         
         if data.get("status") != "OK":
             return None
         
-        return data.get("result")
+        result = data.get("result")
+        await PLACE_DETAILS_CACHE.set(place_id, result, ttl=PLACE_DETAILS_CACHE_TTL)
+        return result
 
     def format_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Format the search results into a structured list."""
-        if not results:
-            return []
-        
-        formatted_results = []
-        for place in results:
-            formatted_place = {
-                "name": place.get("name", "Unnamed place"),
-                "address": place.get("formatted_address", "No address available"),
-                "rating": place.get("rating", None),
-                "website": place.get("website", None),
-                "phone": place.get("formatted_phone_number", None),
-                "opening_hours": place.get("opening_hours", {}).get("weekday_text", []) if place.get("opening_hours") else None,
-                "user_ratings_total": place.get("user_ratings_total", None)
-            }
-            formatted_results.append(formatted_place)
-        
-        return formatted_results
+        return _PLACE_RESULTS_ADAPTER.dump_python(_PLACE_RESULTS_ADAPTER.validate_python(results))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Built once per worker and shared across requests
+    app.state.maps_llm = GoogleMapsLLMIntegration(GOOGLE_MAPS_API_KEY, openai_client)
+    yield
+    await HTTP_CLIENT.aclose()
+    await openai_client.close()
+    if LLM_CACHE is not None:
+        await LLM_CACHE.client.aclose()
+    GEOCODE_DISK_CACHE.close()
 
 # Create FastAPI app
-app = FastAPI(title="Restaurant Finder API")
+app = FastAPI(title="Restaurant Finder API", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Add CORS middleware to the app
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000"],  # React dev server
+    allow_origins=CORS_ORIGINS,  # React dev server by default
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,  # let browsers reuse a preflight for a day
 )
 
 # Define request model
@@ -288,56 +860,70 @@ class QueryRequest(BaseModel):
     query: str
 
 # Define API endpoints
-@app.post("/search")
-async def search_places(request: QueryRequest):
+@app.post("/search", response_class=ORJSONResponse, response_model=None)
+async def search_places(request: QueryRequest, http_request: Request):
     """
     Search for places based on natural language query
     """
     try:
-        print("\n=== New search request received ===")
-        print(f"Request body: {request}")
-        print(f"Query content: {request.query}")
-        
-        # Log environment variables (masked)
-        print(f"Google Maps API Key present: {'Yes' if GOOGLE_MAPS_API_KEY else 'No'}")
-        print(f"OpenAI API Key present: {'Yes' if OPENAI_API_KEY else 'No'}")
-        
-        # Initialize integration
-        print("Initializing GoogleMapsLLMIntegration...")
-        maps_llm = GoogleMapsLLMIntegration(GOOGLE_MAPS_API_KEY, openai_client)
+        logger.debug("New search request received: %s", request.query)
         
         # Process query
-        print("Processing query...")
-        results = maps_llm.process_query(request.query)
+        logger.debug("Processing query...")
+        results = await http_request.app.state.maps_llm.process_query(request.query)
         
-        print("=== Request processing completed ===")
-        print(f"Results type: {type(results)}")
-        print(f"Results length: {len(results) if results else 0}")
+        logger.debug("Request processing completed with %d results", len(results))
         
-        response_data = {"results": results}
-        print(f"Sending response: {response_data}")
-        
-        return response_data
+        return ORJSONResponse({"results": results})
         
     except Exception as e:
-        print("\n=== Error in API endpoint ===")
-        print(f"Error type: {type(e)}")
-        print(f"Error message: {str(e)}")
-        import traceback
-        print(f"Traceback:\n{traceback.format_exc()}")
+        logger.exception("Error in API endpoint: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/search/stream")
+async def search_places_stream(request: QueryRequest, http_request: Request):
+    """
+    Search for places, streaming each result as a line of NDJSON as soon as
+    its details are fetched
+    """
+    logger.debug("New streaming search request received: %s", request.query)
+    maps_llm = http_request.app.state.maps_llm
+
+    async def ndjson():
+        async for place in maps_llm.process_query_stream(request.query):
+            yield orjson.dumps(place) + b"\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
 # Add a test endpoint to verify the server is running
 @app.get("/ping")
 async def ping():
-    return {"status": "ok", "message": "Server is running"}
+    return {
+        "status": "ok",
+        "message": "Server is running",
+        "cache": {
+            name: {"hits": cache.hits, "misses": cache.misses}
+            for name, cache in (
+                ("query_analysis", QUERY_ANALYSIS_EXACT_CACHE),
+                ("query_analysis_semantic", QUERY_ANALYSIS_CACHE),
+                ("geocode", GEOCODE_MEMORY_CACHE),
+                ("place_details", PLACE_DETAILS_CACHE),
+                ("nearby_search", NEARBY_SEARCH_CACHE)
+            )
+        }
+    }
 
 # Modified main section
 if __name__ == "__main__":
     import uvicorn
-    print("\n=== Starting FastAPI server ===")
-    print(f"CORS origins enabled for: http://localhost:3000")
-    print(f"API endpoints available:")
-    print(f"  - POST /search")
-    print(f"  - GET /ping")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    logger.info("Starting FastAPI server")
+    logger.info("CORS origins enabled for: %s", ", ".join(CORS_ORIGINS))
+    logger.info("API endpoints available: POST /search, POST /search/stream, GET /ping")
+    # uvloop and httptools come with uvicorn[standard]. Each worker is a separate
+    # process with its own in-memory caches; set REDIS_URL to share LLM cache hits
+    # (the geocode disk cache is already shared).
+    workers = int(os.getenv("WEB_CONCURRENCY", max(2, os.cpu_count() or 1)))
+    uvicorn.run(
+        "main:app", host="0.0.0.0", port=8000, loop="uvloop", http="httptools", workers=workers,
+        log_level=os.getenv("LOG_LEVEL", "INFO").lower()
+    )
\ No newline at end of file
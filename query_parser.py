@@ -0,0 +1,103 @@
+"""
+Rule-based query parser used by QueryAnalysisAgent.
+
+Simple queries the precompiled patterns fully cover are answered without an
+LLM call, and the same parse is the fallback when the LLM fails. Kept free of
+third-party imports so it can be tested on its own.
+"""
+import re
+from typing import Any, Dict, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of user-supplied text, used as a cache key"""
+    return " ".join(query.lower().split())
+
+
+# Precompiled patterns for the rule-based query parser. Queries are lowercased
+# by normalize_query before they reach these.
+_PLACE_TYPES = {
+    "restaurant": "restaurant", "cafe": "cafe", "coffee shop": "cafe", "bar": "bar", "pub": "bar",
+    "bakery": "bakery", "bakerie": "bakery", "gym": "gym", "pharmacy": "pharmacy", "pharmacie": "pharmacy",
+    "supermarket": "supermarket", "museum": "museum", "park": "park", "hotel": "lodging"
+}
+_PLACE_RE = re.compile(
+    r"^(?P<prefix>.*?)\b(?P<type>restaurant|cafe|coffee shop|bar|pub|bakerie|bakery|gym|pharmacie|pharmacy"
+    r"|supermarket|museum|park|hotel)s?\b"
+)
+_LOCATION_RE = re.compile(
+    r"\b(?:in|near|around)\s+(.+?)(?=\s+(?:which|that|open|offer|offers|offering|serve|serves|serving|with|on)\b|[?.!]*$)"
+)
+_OFFER_RE = re.compile(r"\b(?:offer|offers|offering|serve|serves|serving|with)\s+(.+?)[?.!]*$")
+_OPEN_RE = re.compile(r"\bopen\s+(till|until|til|from|at)\s+(\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?)")
+_DAY_RE = re.compile(r"\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday)s?\b")
+_TIME_CONTEXTS = {"till": "open_until", "until": "open_until", "til": "open_until", "from": "open_from", "at": "open_at"}
+_FILLER_WORDS = frozenset(
+    "give me a an list of all the find show tell which what are there any some good nearby please".split()
+)
+# Words allowed to remain unmatched in a query the rule-based parse fully covers
+_CONNECTOR_WORDS = _FILLER_WORDS | {"on", "is", "that", "and"}
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_ARTICLE_RE = re.compile(r"^(?:(?:a|an|the|some|any)\s+)+")
+# Locations the parser can't resolve on its own: relative to the user, or
+# naming several places at once
+_UNRESOLVABLE_LOCATION_RE = re.compile(r"^(?:me|here|us|my location|my current location|where i am)$|\b(?:and|or)\b")
+# A second preposition means the patterns split the query in the wrong place
+# ("parking near the park in london")
+_PREPOSITION_RE = re.compile(r"\b(?:in|near|around)\b")
+# Negated requirements would be sent to Google as keywords
+_NEGATION_RE = re.compile(r"\b(?:no|not|non|without|never|except|don't|doesn't|isn't|aren't)\b")
+
+
+def resolvable_location(location: str) -> bool:
+    """Whether a parsed location can be geocoded as-is"""
+    return bool(location) and not _UNRESOLVABLE_LOCATION_RE.search(location)
+
+
+def regex_parse_query(query: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Rule-based parse of a normalized query into the QueryAnalysis shape.
+    Slots that the patterns can't find are left empty. The flag is True when
+    the patterns account for every meaningful word of the query and the
+    required slots are filled, i.e. when the parse can stand in for the LLM.
+    """
+    place = _PLACE_RE.search(query)
+    location = _LOCATION_RE.search(query)
+    offer = _OFFER_RE.search(query)
+    opening = _OPEN_RE.search(query)
+    day = _DAY_RE.search(query)
+
+    attributes = []
+    if place:
+        attributes = [word for word in place.group("prefix").split() if word not in _CONNECTOR_WORDS]
+    if offer:
+        attributes.append(_ARTICLE_RE.sub("", offer.group(1)))
+
+    analysis = {
+        "intent": "find_places",
+        "place_type": _PLACE_TYPES[place.group("type")] if place else "",
+        "attributes": attributes,
+        "location": location.group(1).strip(" ,") if location else "",
+        "temporal": {
+            "day": day.group(1) if day else None,
+            "time": opening.group(2).strip() if opening else None,
+            "time_context": _TIME_CONTEXTS[opening.group(1)] if opening else None
+        },
+        "preferences": []
+    }
+
+    covered = bytearray(len(query))
+    for match in (place, location, offer, opening, day):
+        if match:
+            covered[match.start():match.end()] = b"\x01" * (match.end() - match.start())
+    leftover = "".join(" " if covered[i] else char for i, char in enumerate(query))
+    complete = (
+        bool(place and location)
+        and resolvable_location(analysis["location"])
+        and not _PREPOSITION_RE.search(place.group("prefix"))
+        and not _PREPOSITION_RE.search(analysis["location"])
+        and not _NEGATION_RE.search(query)
+        and (day is None) == (opening is None)
+        and all(word in _CONNECTOR_WORDS for word in _WORD_RE.findall(leftover))
+    )
+    return analysis, complete
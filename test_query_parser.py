@@ -0,0 +1,77 @@
+import pytest
+
+from query_parser import normalize_query, regex_parse_query, resolvable_location
+
+
+def parse(query):
+    return regex_parse_query(normalize_query(query))
+
+
+@pytest.mark.parametrize("query, place_type, attributes, location, temporal", [
+    # README examples
+    (
+        "Give me a list of cafes in Berlin open till 8pm on a Sunday.",
+        "cafe", [], "berlin", {"day": "sunday", "time": "8pm", "time_context": "open_until"}
+    ),
+    (
+        "Which restaurants in HSR layout, Bengaluru offer vegetarian burgers?",
+        "restaurant", ["vegetarian burgers"], "hsr layout, bengaluru",
+        {"day": None, "time": None, "time_context": None}
+    ),
+    (
+        "is there a gym in berlin",
+        "gym", [], "berlin", {"day": None, "time": None, "time_context": None}
+    ),
+    (
+        "hotels in paris with a pool",
+        "lodging", ["pool"], "paris", {"day": None, "time": None, "time_context": None}
+    ),
+    (
+        "vegan restaurants near Kreuzberg open until 10:30 pm on fridays",
+        "restaurant", ["vegan"], "kreuzberg", {"day": "friday", "time": "10:30 pm", "time_context": "open_until"}
+    ),
+])
+def test_complete_parses(query, place_type, attributes, location, temporal):
+    analysis, complete = parse(query)
+    assert complete
+    assert analysis["place_type"] == place_type
+    assert analysis["attributes"] == attributes
+    assert analysis["location"] == location
+    assert analysis["temporal"] == temporal
+
+
+@pytest.mark.parametrize("query", [
+    # Deictic locations
+    "cafes near me",
+    "bars around here",
+    "cafes near my location",
+    # Several locations at once
+    "restaurants in berlin and munich",
+    "pubs in london or paris",
+    # Split at the wrong preposition
+    "parking near the park in london",
+    # Negated requirements
+    "restaurants in berlin with no outdoor seating",
+    "restaurants without music in berlin",
+    # Time without a day
+    "restaurants in berlin open till 9pm",
+    # Missing place type or location
+    "best sushi in tokyo",
+    "vegan restaurants",
+    # Words the patterns don't account for
+    "vegan restaurants in york that allow dogs",
+])
+def test_incomplete_parses(query):
+    assert not parse(query)[1]
+
+
+@pytest.mark.parametrize("location, expected", [
+    ("berlin", True),
+    ("hsr layout, bengaluru", True),
+    ("", False),
+    ("me", False),
+    ("here", False),
+    ("berlin and munich", False),
+])
+def test_resolvable_location(location, expected):
+    assert resolvable_location(location) == expected